@@ -1,7 +1,13 @@
+import atexit
 import os
+import random
 import re
+import signal
+import threading
 import time
+import urllib.request
 from datetime import datetime, timedelta
+from html.parser import HTMLParser
 from pathlib import Path
 from zoneinfo import ZoneInfo
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
@@ -22,6 +28,10 @@ def log(msg: str):
     print(f"[{_ts()} {_dt()}] {msg}", flush=True)
 
 
+# 收到 SIGTERM/SIGINT 时置位，所有等待都用它，能被立即唤醒
+_stop = threading.Event()
+
+
 # ====== 站点配置 ======
 URL = "https://si-qi.xyz/mowan.php"
 COOKIE_NAME = os.getenv("SIQI_COOKIE_NAME", "c_secure_pass")
@@ -38,7 +48,6 @@ COOKIE_FILE_PATH = Path(
 
 # ====== 参数 ======
 CHECK_INTERVAL_MS = 3000
-ITEM_CLICK_INTERVAL_MS = 200
 STATUS_RECHECK_INTERVAL_SEC = int(os.getenv("MOWAN_STATUS_RECHECK_SEC", str(3600)))
 CLEAN_SESSION_SEC = int(os.getenv("MOWAN_SESSION_SEC", str(600)))
 DEFAULT_NEXT_INTERVAL_SEC = int(os.getenv("MOWAN_DEFAULT_NEXT_SEC", str(2 * 3600)))
@@ -47,6 +56,12 @@ BRICK_RECHECK_INTERVAL_SEC = int(os.getenv("MOWAN_BRICK_RECHECK_SEC", str(6 * 36
 BRICK_CLICK_COUNT = int(os.getenv("MOWAN_BRICK_CLICKS", "50"))
 BRICK_CLICK_INTERVAL_MS = int(os.getenv("MOWAN_BRICK_CLICK_MS", "150"))
 MIN_WAIT_AFTER_CHECK_SEC = 30
+FAILURE_BACKOFF_BASE_SEC = 60
+FAILURE_BACKOFF_MAX_SEC = 1800
+HTTP_PROBE_TIMEOUT_SEC = 15
+ITEM_CLICK_INTERVAL_MS = 1200  # 两次捡拾之间的间隔，沿用原先 click 后 sleep(1) + 200ms 的节奏
+# 用启动参数禁图，不走 context.route（路由会让 Chromium 绕过 HTTP 缓存）；样式表照常加载
+BLOCK_RESOURCES = os.getenv("MOWAN_BLOCK_RESOURCES", "true").lower() != "false"
 
 # ====== 选择器 ======
 SEL_CLEAN_BTN = "#beachBtn"
@@ -58,11 +73,24 @@ SEL_BRICK_STATUS_AREA = "#brickStatus"
 
 COUNTDOWN_RE = re.compile(r"(\d{1,2}):(\d{2}):(\d{2})")
 
+# 在页面内批量派发 click，省掉每次点击一次 CDP 往返；ms > 0 时每次成功点击后停顿 ms
+DISPATCH_CLICKS_JS = """async ([sels, ms]) => {
+    const out = [];
+    for (const s of sels) {
+        const el = document.querySelector(s);
+        if (!el) { out.push(false); continue; }
+        el.dispatchEvent(new MouseEvent('click', { bubbles: true }));
+        out.push(true);
+        if (ms > 0) await new Promise(r => setTimeout(r, ms));
+    }
+    return out;
+}"""
+
 
 def parse_countdown_text(text: str | None) -> int | None:
     if not text:
         return None
-    text = text.strip()
+    # search 本身会跳过首尾空白，无需先 strip 复制一份
     match = COUNTDOWN_RE.search(text)
     if match:
         h, m, s = map(int, match.groups())
@@ -73,23 +101,46 @@ def parse_countdown_text(text: str | None) -> int | None:
 def open_target(page):
     backoff = 1.0
     while True:
-        try:
-            page.goto(URL, wait_until="domcontentloaded", timeout=45_000)
+        if _stop.is_set():
+            log("[open] stop requested, giving up navigation")
             return
+        try:
+            page.goto(URL, wait_until="domcontentloaded", timeout=15_000)
+            break
         except Exception as e:
             log(f"[open] load failed, retry in {backoff:.1f}s: {e}")
-            time.sleep(backoff)
+            _stop.wait(backoff)
             backoff = min(backoff * 1.8, 10)
+    # 等调用方真正要读的内容：状态区有了文字，说明页面脚本已渲染
+    try:
+        page.wait_for_function(
+            "sel => !!document.querySelector(sel)?.innerText.trim()",
+            arg=SEL_STATUS_AREA,
+            timeout=10_000,
+        )
+    except PlaywrightTimeoutError:
+        log("[open] #beachStatus still empty within timeout, continue anyway")
+
+
+# cookie 文件按 mtime 缓存；storage_state 按 cookie 值缓存
+_COOKIE_CACHE = {"mtime": None, "value": None}
+_STORAGE_STATE_CACHE = {"value": None, "state": None}
 
 
 def ensure_cookie_value() -> str:
     env_cookie = (os.getenv("MOWAN_COOKIE") or os.getenv("SIQI_COOKIE") or "").strip()
     if env_cookie:
         return env_cookie
-    if COOKIE_FILE_PATH.exists():
-        value = COOKIE_FILE_PATH.read_text(encoding="utf-8").strip()
-        if value:
-            return value
+    try:
+        mtime = COOKIE_FILE_PATH.stat().st_mtime_ns
+    except OSError:
+        mtime = None
+    if mtime is not None:
+        if mtime != _COOKIE_CACHE["mtime"]:
+            _COOKIE_CACHE["value"] = COOKIE_FILE_PATH.read_text(encoding="utf-8").strip()
+            _COOKIE_CACHE["mtime"] = mtime
+        if _COOKIE_CACHE["value"]:
+            return _COOKIE_CACHE["value"]
     raise RuntimeError(
         f"未找到 cookie。请在管理页面填写 {COOKIE_NAME}，或设置 SIQI_COOKIE/MOWAN_COOKIE 环境变量。"
     )
@@ -97,7 +148,9 @@ def ensure_cookie_value() -> str:
 
 def build_storage_state() -> dict:
     cookie_value = ensure_cookie_value()
-    return {
+    if _STORAGE_STATE_CACHE["value"] == cookie_value:
+        return _STORAGE_STATE_CACHE["state"]
+    state = {
         "cookies": [
             {
                 "name": COOKIE_NAME,
@@ -111,6 +164,9 @@ def build_storage_state() -> dict:
         ],
         "origins": [],
     }
+    _STORAGE_STATE_CACHE["value"] = cookie_value
+    _STORAGE_STATE_CACHE["state"] = state
+    return state
 
 
 def click_clean_button(page):
@@ -135,43 +191,109 @@ def click_clean_button(page):
         log(f"[btn state] err: {e}")
 
 
-def click_drops(page):
-    items = page.locator(SEL_DROP_ITEMS)
+def install_drop_observer(page) -> bool:
+    """在页面内挂 MutationObserver，把新出现的掉落物选择器推进 window.__drops 队列"""
     try:
-        page.wait_for_load_state("networkidle", timeout=5_000)
-    except PlaywrightTimeoutError:
-        log("[drops] wait_for_load_state timeout, continue anyway")
+        return bool(page.evaluate(
+            """([areaSel, itemSel]) => {
+                const area = document.querySelector(areaSel);
+                if (!area) return false;
+                window.__drops = [];
+                window.__dropSeq = window.__dropSeq || 0;
+                const selectorFor = window.__dropKey = (n) => {
+                    if (!n.dataset.dropKey) n.dataset.dropKey = String(++window.__dropSeq);
+                    return `[data-drop-key="${n.dataset.dropKey}"]`;
+                };
+                for (const n of document.querySelectorAll(itemSel)) window.__drops.push(selectorFor(n));
+                if (window.__dropObserver) window.__dropObserver.disconnect();
+                window.__dropObserver = new MutationObserver(ms => {
+                    for (const m of ms)
+                        for (const n of m.addedNodes)
+                            if (n.nodeType === 1 && n.matches(itemSel))
+                                window.__drops.push(selectorFor(n));
+                });
+                window.__dropObserver.observe(area, { childList: true });
+                window.__dropArea = area;
+                return true;
+            }""",
+            [SEL_BEACH_AREA, SEL_DROP_ITEMS],
+        ))
     except Exception as e:
-        log(f"[drops] wait_for_load_state err: {e}")
-    page.wait_for_timeout(200)
+        log(f"[drops] install observer err: {e}")
+        return False
+
+
+def reinstall_observers(page):
+    """(重新)挂上页面内的全部 observer；导航或 #beachArea 被整体替换后调用"""
+    install_drop_observer(page)
+
+
+def drain_drops(page) -> list[tuple[str, str]] | None:
+    """
+    取出队列中的掉落物，并补上 #beachArea 里仍然存在的（上次没捡掉的会再点一次），
+    连同文本一并返回：[(选择器, 文本), ...]
+    observer 已失效（#beachArea 被替换或页面重载）时返回 None。
+    """
     try:
-        count = items.count()
-    except Exception:
-        count = 0
+        return page.evaluate(
+            """(itemSel) => {
+                if (!window.__dropArea || !window.__dropArea.isConnected) return null;
+                const sels = new Set(window.__drops || []);
+                window.__drops = [];
+                for (const n of document.querySelectorAll(itemSel)) sels.add(window.__dropKey(n));
+                return [...sels]
+                    .map(sel => [sel, document.querySelector(sel)])
+                    .filter(([, el]) => el)
+                    .map(([sel, el]) => [sel, (el.innerText || '').trim()]);
+            }""",
+            SEL_DROP_ITEMS,
+        )
+    except Exception as e:
+        log(f"[drops] drain err: {e}")
+        return []
+
+
+def dispatch_clicks(page, selectors: list[str], interval_ms: int = 0) -> list[bool]:
+    """一次 evaluate 内对所有选择器派发 click 事件，返回每个元素是否点到"""
+    if not selectors:
+        return []
+    return page.evaluate(DISPATCH_CLICKS_JS, [selectors, interval_ms])
+
+
+def wait_for_drops(page, timeout_ms: int):
+    """等 observer 队列里出现新掉落物，最多等 timeout_ms；代替固定间隔 sleep"""
+    try:
+        page.wait_for_function(
+            "() => (window.__drops || []).length > 0", timeout=timeout_ms
+        )
+    except PlaywrightTimeoutError:
+        pass
+    except Exception as e:
+        log(f"[drops] wait err: {e}")
+        page.wait_for_timeout(timeout_ms)
+
+
+def click_drops(page):
+    drops = drain_drops(page)
+    if drops is None:
+        log("[drops] observer lost, reinstalling...")
+        reinstall_observers(page)
+        drops = drain_drops(page) or []
+    count = len(drops)
     if count <= 0:
         return
-    for i in range(count):
-        el = items.first
-        try:
-            txt = el.inner_text(timeout=500)
-        except Exception:
-            txt = ''
-        try:
-            try:
-                el.scroll_into_view_if_needed()
-            except Exception:
-                pass
-            try:
-                el.click(timeout=1500)
-                log(f"[click item {i+1}/{count}] ✅ success  [{txt.strip()}]")
-                time.sleep(1)
-            except PlaywrightTimeoutError as e:
-                log(f"[click item {i+1}/{count}] timeout: {e}")
-            except Exception as e:
-                log(f"[click item {i+1}/{count}] err: {e}")
-        except Exception as e:
-            log(f"[item {i+1}] unexpected: {e}")
-        page.wait_for_timeout(ITEM_CLICK_INTERVAL_MS)
+    selectors = [sel for sel, _ in drops]
+    texts = [txt for _, txt in drops]
+    try:
+        results = dispatch_clicks(page, selectors, ITEM_CLICK_INTERVAL_MS)
+    except Exception as e:
+        log(f"[drops] batch click err: {e}")
+        return
+    for i, (ok, txt) in enumerate(zip(results, texts)):
+        if ok:
+            log(f"[click item {i+1}/{count}] ✅ success  [{txt}]")
+        else:
+            log(f"[click item {i+1}/{count}] gone before click")
 
 
 def read_countdown_seconds(page, *, timeout_ms: int = 10000) -> int | None:
@@ -206,6 +328,24 @@ def read_countdown_seconds(page, *, timeout_ms: int = 10000) -> int | None:
     return None
 
 
+def parse_brick_status(text: str) -> int | None:
+    """解析 #brickStatus 文本，返回值同 read_brick_status"""
+    text_stripped = text.strip()
+
+    # 关键：直接从 #brickStatus 文本判断
+    if "可以搬砖" in text_stripped:
+        log(f"[brick] ✅ 砖场可用，text='{text_stripped}'")
+        return 0
+
+    seconds = parse_countdown_text(text_stripped)
+    if seconds is not None:
+        log(f"[brick] 冷却中，text='{text_stripped}' => {seconds}s")
+        return seconds
+
+    log(f"[brick] 未知状态，text='{text_stripped}'")
+    return None
+
+
 def read_brick_status(page, *, timeout_ms: int = 10000) -> int | None:
     """
     读取砖场状态，直接解析 #brickStatus 文本。
@@ -217,21 +357,7 @@ def read_brick_status(page, *, timeout_ms: int = 10000) -> int | None:
     try:
         status_el = page.locator(SEL_BRICK_STATUS_AREA)
         status_el.wait_for(state="attached", timeout=timeout_ms)
-        text = status_el.inner_text(timeout=3000)
-        text_stripped = text.strip()
-
-        # 关键：直接从 #brickStatus 文本判断
-        if "可以搬砖" in text_stripped:
-            log(f"[brick] ✅ 砖场可用，text='{text_stripped}'")
-            return 0
-
-        seconds = parse_countdown_text(text_stripped)
-        if seconds is not None:
-            log(f"[brick] 冷却中，text='{text_stripped}' => {seconds}s")
-            return seconds
-
-        log(f"[brick] 未知状态，text='{text_stripped}'")
-        return None
+        return parse_brick_status(status_el.inner_text(timeout=3000))
     except PlaywrightTimeoutError:
         log("[brick] #brickStatus not found within timeout")
     except Exception as e:
@@ -239,6 +365,33 @@ def read_brick_status(page, *, timeout_ms: int = 10000) -> int | None:
     return None
 
 
+def read_statuses(page) -> tuple[int | None, int | None]:
+    """一次 evaluate 同时读清理倒计时与砖场状态，返回 (清理秒数, 砖场状态)"""
+    try:
+        beach_text, brick_text = page.evaluate(
+            """(sels) => sels.map(s => document.querySelector(s)?.innerText ?? null)""",
+            [SEL_STATUS_AREA, SEL_BRICK_STATUS_AREA],
+        )
+    except Exception as e:
+        log(f"[status] read statuses err: {e}")
+        return None, None
+
+    clean_seconds = None
+    if beach_text is None:
+        log("[status] #beachStatus not found")
+    else:
+        clean_seconds = parse_countdown_text(beach_text)
+        if clean_seconds is not None:
+            log(f"[status] beachStatus text='{beach_text.strip()}' => {clean_seconds}s")
+        else:
+            log(f"[status] no countdown in beachStatus, text='{beach_text.strip()}'")
+
+    if brick_text is None:
+        log("[brick] #brickStatus not found")
+        return clean_seconds, None
+    return clean_seconds, parse_brick_status(brick_text)
+
+
 def wait_for_brick_factory_ready(page, timeout_sec: int = 30) -> bool:
     factory = page.locator(SEL_BRICK_FACTORY)
     try:
@@ -246,69 +399,161 @@ def wait_for_brick_factory_ready(page, timeout_sec: int = 30) -> bool:
     except PlaywrightTimeoutError:
         log("[brick] factory element missing")
         return False
-    deadline = time.time() + timeout_sec
-    while time.time() < deadline:
-        try:
-            ready = factory.evaluate(
-                "el => window.getComputedStyle(el).pointerEvents !== 'none'"
-            )
-        except Exception:
-            ready = False
-        if ready:
-            return True
-        time.sleep(1)
+    # 页面通过改 class/style 解锁工坊；用 MutationObserver 等变化，不再每秒轮询。
+    # 监听整棵 body，祖先节点的 class 变化同样会影响计算后的 pointer-events。
+    try:
+        ready = page.evaluate(
+            """([sel, timeout]) => new Promise(resolve => {
+                // 样式表未加载完时计算样式不可信（锁定的工坊也会是 auto），先等 load
+                const check = () => {
+                    const el = document.querySelector(sel);
+                    return document.readyState === 'complete'
+                        && !!el && getComputedStyle(el).pointerEvents !== 'none';
+                };
+                const mo = new MutationObserver(() => {
+                    if (check()) { mo.disconnect(); resolve(true); }
+                });
+                const start = () => {
+                    if (check()) return resolve(true);
+                    mo.observe(document.body, {
+                        attributes: true, subtree: true, attributeFilter: ['class', 'style'],
+                    });
+                };
+                if (document.readyState === 'complete') start();
+                else window.addEventListener('load', start, { once: true });
+                setTimeout(() => { mo.disconnect(); resolve(check()); }, timeout);
+            })""",
+            [SEL_BRICK_FACTORY, timeout_sec * 1000],
+        )
+    except Exception as e:
+        log(f"[brick] wait ready err: {e}")
+        ready = False
+    if ready:
+        return True
     log("[brick] factory still locked after waiting")
     return False
 
 
 def click_brick_factory(page, clicks: int = BRICK_CLICK_COUNT):
-    factory = page.locator(SEL_BRICK_FACTORY)
     success = 0
-    for i in range(clicks):
-        try:
-            factory.click(timeout=3000)
-            success += 1
-            log(f"[brick] click {i+1}/{clicks} ✅")
-        except PlaywrightTimeoutError as e:
-            log(f"[brick] click {i+1} timeout: {e}")
-            break
-        except Exception as e:
-            log(f"[brick] click {i+1} unexpected: {e}")
-            break
-        page.wait_for_timeout(BRICK_CLICK_INTERVAL_MS)
+    try:
+        # 整个点击序列在页面内完成；每次间隔后再等一帧，保证上一次点击已渲染。
+        # 工坊消失或重新锁定（pointer-events: none）时提前结束，返回实际点击次数。
+        success = page.evaluate(
+            """async ({sel, n, ms}) => {
+                let done = 0;
+                for (let i = 0; i < n; i++) {
+                    const el = document.querySelector(sel);
+                    if (!el || getComputedStyle(el).pointerEvents === 'none') break;
+                    el.dispatchEvent(new MouseEvent('click', { bubbles: true }));
+                    done++;
+                    await new Promise(r => setTimeout(r, ms));
+                    await new Promise(r => requestAnimationFrame(r));
+                }
+                return done;
+            }""",
+            {"sel": SEL_BRICK_FACTORY, "n": clicks, "ms": BRICK_CLICK_INTERVAL_MS},
+        )
+    except Exception as e:
+        log(f"[brick] batch click unexpected: {e}")
     log(f"[brick] 完成 {success}/{clicks} 次点击")
     return success
 
 
-def open_page_session(playwright_obj):
-    browser = playwright_obj.chromium.launch(
-        headless=True,
-        args=["--disable-blink-features=AutomationControlled"],
-    )
-    storage_state = build_storage_state()
+def run_brick_step(page):
+    brick_status = read_brick_status(page)
+    if brick_status == 0:
+        # 砖场可用，执行搬砖
+        if wait_for_brick_factory_ready(page):
+            click_brick_factory(page)
+        else:
+            log("[brick] 工坊未解锁，跳过点击")
+    elif brick_status is not None and brick_status > 0:
+        log(f"[brick] 砖场冷却中，还需 {brick_status}s")
+    else:
+        log("[brick] 砖场状态未知，跳过")
+
+
+_PW = None
+
+
+def get_playwright():
+    """Playwright 驱动进程全局只启动一次，进程退出时统一关闭"""
+    global _PW
+    if _PW is None:
+        _PW = sync_playwright().start()
+    return _PW
+
+
+def restart_playwright():
+    """驱动进程已退出（如 Node 崩溃、终端 SIGINT 波及进程组）时丢弃旧实例，重新启动"""
+    global _PW
+    if _PW is not None:
+        try:
+            _PW.stop()
+        except Exception:
+            pass
+        _PW = None
+    log("[watchdog] restarting playwright driver...")
+    return get_playwright()
+
+
+def _stop_playwright():
+    if _PW is not None:
+        try:
+            _PW.stop()
+        except Exception:
+            pass
+
+
+atexit.register(_stop_playwright)
+
+
+def launch_browser(playwright_obj):
+    args = ["--disable-blink-features=AutomationControlled"]
+    if BLOCK_RESOURCES:
+        args.append("--blink-settings=imagesEnabled=false")
+    return playwright_obj.chromium.launch(headless=True, args=args)
+
+
+def new_browser_context(browser, storage_state: dict):
     log("🔐 使用当前 cookie 登录…")
     context = browser.new_context(
         storage_state=storage_state,
         viewport={"width": 1280, "height": 800},
     )
+    # 原生弹窗直接短路，避免点击时卡在对话框上
+    context.add_init_script("window.confirm = () => true; window.alert = () => {};")
+    return context
+
+
+def open_page_session(context):
     page = context.new_page()
+    page.on("dialog", lambda dialog: dialog.accept())
     open_target(page)
-    try:
-        page.wait_for_selector(SEL_BEACH_AREA, timeout=20_000)
-    except PlaywrightTimeoutError:
-        pass
-    return browser, page
+    return page
 
 
-def run_loop(page, *, max_runtime_sec: int | None = None):
+def run_loop(page, *, max_runtime_sec: int | None = None, brick_due_at: float | None = None):
+    """清理循环；若给了 brick_due_at，到点后在同一页面顺带搬砖，不再单独开会话"""
     start = time.time()
+    reinstall_observers(page)
     while True:
         click_clean_button(page)
         click_drops(page)
-        page.wait_for_timeout(CHECK_INTERVAL_MS)
-        if not page.url.startswith(URL):
-            log("[watchdog] url changed, navigating back...")
+        if brick_due_at is not None and time.time() >= brick_due_at:
+            log("🧱 清理会话中顺带搬砖…")
+            run_brick_step(page)
+            brick_due_at = None
+        wait_for_drops(page, CHECK_INTERVAL_MS)
+        if _stop.is_set():
+            log("[run_loop] stop requested, exiting loop")
+            break
+        # 只在沙滩区域真的不在了才重新导航，保留页面 JS 状态与已挂的 observer
+        if page.locator(SEL_BEACH_AREA).count() == 0:
+            log("[watchdog] beach area missing, navigating back...")
             open_target(page)
+            reinstall_observers(page)
         if max_runtime_sec and (time.time() - start) >= max_runtime_sec:
             log("[run_loop] reach session runtime limit, exiting loop")
             break
@@ -328,31 +573,120 @@ def _normalize_wait(seconds: int | None, reason: str, fallback: int) -> int:
     return int(seconds)
 
 
-def fetch_countdown_wait(reason: str) -> int:
-    with sync_playwright() as p:
-        browser, page = open_page_session(p)
+class _ElementTextParser(HTMLParser):
+    """取出指定 id 元素自身的文本（到其闭合标签为止，跳过 script/style）"""
+
+    VOID_TAGS = {
+        "area", "base", "br", "col", "embed", "hr", "img", "input",
+        "link", "meta", "source", "track", "wbr",
+    }
+
+    def __init__(self, element_id: str):
+        super().__init__(convert_charrefs=True)
+        self.element_id = element_id
+        self.depth = 0          # >0 表示位于目标元素内部
+        self.matches = 0
+        self.closed = False
+        self.skip = 0           # 位于 script/style 内部
+        self.parts: list[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if self.depth:
+            if tag in ("script", "style"):
+                self.skip += 1
+            if tag not in self.VOID_TAGS:
+                self.depth += 1
+        elif dict(attrs).get("id") == self.element_id:
+            self.matches += 1
+            if tag not in self.VOID_TAGS:
+                self.depth = 1
+
+    def handle_endtag(self, tag):
+        if not self.depth:
+            return
+        if tag in ("script", "style") and self.skip:
+            self.skip -= 1
+        self.depth -= 1
+        if self.depth == 0:
+            self.closed = True
+
+    def handle_data(self, data):
+        if self.depth and not self.skip:
+            self.parts.append(data)
+
+
+def extract_element_text(html: str, element_id: str) -> str | None:
+    """元素不存在、重复出现或未正常闭合时返回 None"""
+    parser = _ElementTextParser(element_id)
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        return None
+    if parser.matches != 1 or not parser.closed or parser.depth:
+        return None
+    return "".join(parser.parts)
+
+
+def fetch_countdown_http() -> int | None:
+    """
+    不开浏览器，直接 GET 页面读服务端渲染的 #beachStatus 倒计时。
+    读不到（请求失败或倒计时由 JS 渲染）时返回 None，由调用方回退到浏览器。
+    """
+    req = urllib.request.Request(
+        URL,
+        headers={
+            "Cookie": f"{COOKIE_NAME}={ensure_cookie_value()}",
+            "User-Agent": "Mozilla/5.0",
+        },
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=HTTP_PROBE_TIMEOUT_SEC) as resp:
+            html = resp.read().decode("utf-8", errors="replace")
+    except Exception as e:
+        log(f"[probe] http fetch err: {e}")
+        return None
+    # 只解析 #beachStatus 元素自身的文本，隔离不干净就回退到浏览器
+    text = extract_element_text(html, SEL_STATUS_AREA.lstrip("#"))
+    if text is None:
+        log("[probe] #beachStatus not isolated in html, fallback to browser")
+        return None
+    seconds = parse_countdown_text(text)
+    if seconds is not None:
+        log(f"[probe] beachStatus via http => {seconds}s")
+    return seconds
+
+
+def fetch_countdown_wait(context, reason: str) -> int:
+    seconds = fetch_countdown_http()
+    if seconds is not None:
+        return normalize_wait_seconds(seconds, reason)
+    page = open_page_session(context)
+    try:
         seconds = read_countdown_seconds(page)
-        browser.close()
+    finally:
+        page.close()
     return normalize_wait_seconds(seconds, reason)
 
 
-def fetch_brick_wait(reason: str) -> int:
-    with sync_playwright() as p:
-        browser, page = open_page_session(p)
+def fetch_brick_wait(context, reason: str) -> int:
+    page = open_page_session(context)
+    try:
         seconds = read_brick_status(page)
-        browser.close()
+    finally:
+        page.close()
     return _normalize_wait(seconds, reason, BRICK_DEFAULT_INTERVAL_SEC)
 
 
-def run_cleaning_session() -> tuple[int, int | None]:
-    with sync_playwright() as p:
-        browser, page = open_page_session(p)
+def run_cleaning_session(context, brick_due_at: float | None = None) -> tuple[int, int | None]:
+    page = open_page_session(context)
+    try:
         log("🚀 开始自动清理会话...")
-        run_loop(page, max_runtime_sec=CLEAN_SESSION_SEC)
-        next_seconds = read_countdown_seconds(page)
-        brick_seconds = read_brick_status(page)
-        browser.close()
+        run_loop(page, max_runtime_sec=CLEAN_SESSION_SEC, brick_due_at=brick_due_at)
+        next_seconds, brick_seconds = read_statuses(page)
         log("✅ 清理会话完成")
+    finally:
+        page.close()
     brick_wait = (
         _normalize_wait(brick_seconds, "同步砖场", BRICK_DEFAULT_INTERVAL_SEC)
         if brick_seconds is not None
@@ -361,25 +695,15 @@ def run_cleaning_session() -> tuple[int, int | None]:
     return normalize_wait_seconds(next_seconds, "post-clean"), brick_wait
 
 
-def run_brick_session() -> tuple[int, int | None]:
-    with sync_playwright() as p:
-        browser, page = open_page_session(p)
+def run_brick_session(context) -> tuple[int, int | None]:
+    page = open_page_session(context)
+    try:
         log("🧱 搬砖工坊检查中…")
-        brick_status = read_brick_status(page)
-        if brick_status == 0:
-            # 砖场可用，执行搬砖
-            if wait_for_brick_factory_ready(page):
-                click_brick_factory(page)
-            else:
-                log("[brick] 工坊未解锁，跳过点击")
-        elif brick_status is not None and brick_status > 0:
-            log(f"[brick] 砖场冷却中，还需 {brick_status}s")
-        else:
-            log("[brick] 砖场状态未知，跳过")
-        next_seconds = read_brick_status(page)
-        clean_seconds = read_countdown_seconds(page)
-        browser.close()
+        run_brick_step(page)
+        clean_seconds, next_seconds = read_statuses(page)
         log("🧱 搬砖流程完成")
+    finally:
+        page.close()
     clean_wait = (
         normalize_wait_seconds(clean_seconds, "同步清理")
         if clean_seconds is not None
@@ -388,14 +712,106 @@ def run_brick_session() -> tuple[int, int | None]:
     return _normalize_wait(next_seconds, "post-brick", BRICK_DEFAULT_INTERVAL_SEC), clean_wait
 
 
+class SessionRunner:
+    """整个调度周期共用一个浏览器与 context，只在异常时重建 context"""
+
+    def __init__(self, playwright_obj):
+        self.playwright = playwright_obj
+        self.browser = self.launch()
+        self.storage_state = build_storage_state()
+        self.context = new_browser_context(self.browser, self.storage_state)
+
+    def launch(self):
+        try:
+            return launch_browser(self.playwright)
+        except Exception as e:
+            if _stop.is_set():
+                raise
+            log(f"[watchdog] browser launch failed, driver may be gone: {e}")
+            self.playwright = restart_playwright()
+            return launch_browser(self.playwright)
+
+    def sync_cookies(self):
+        """cookie 文件或环境变量更新后，把新 cookie 写进正在复用的 context"""
+        storage_state = build_storage_state()
+        if storage_state is self.storage_state:
+            return
+        log("🔐 cookie 已更新，同步到浏览器…")
+        self.context.add_cookies(storage_state["cookies"])
+        self.storage_state = storage_state
+
+    def recreate_context(self):
+        try:
+            self.context.close()
+        except Exception:
+            pass
+        if not self.browser.is_connected():
+            log("[watchdog] browser disconnected, relaunching...")
+            self.browser = self.launch()
+        self.storage_state = build_storage_state()
+        self.context = new_browser_context(self.browser, self.storage_state)
+
+    def call(self, fn, *args):
+        try:
+            self.sync_cookies()
+            return fn(self.context, *args)
+        except Exception as e:
+            # 停止信号下的失败多半是浏览器随进程组一起退出，不再重建重试
+            if _stop.is_set():
+                raise
+            log(f"[watchdog] {fn.__name__} failed, recreating context: {e}")
+            self.recreate_context()
+            return fn(self.context, *args)
+
+    def call_with_backoff(self, fn, *args):
+        """失败后按 60s 起指数退避（带抖动，封顶 30 分钟）重试；收到停止信号时返回 None"""
+        failures = 0
+        while not _stop.is_set():
+            try:
+                return self.call(fn, *args)
+            except Exception as e:
+                if _stop.is_set():
+                    log(f"[scheduler] {fn.__name__} aborted by stop request: {e}")
+                    break
+                delay = min(FAILURE_BACKOFF_BASE_SEC * 2 ** failures, FAILURE_BACKOFF_MAX_SEC)
+                delay *= random.uniform(0.8, 1.2)
+                failures += 1
+                log(f"[scheduler] {fn.__name__} failed x{failures}, retry in {int(delay)}s: {e}")
+                _stop.wait(delay)
+        return None
+
+    def close(self):
+        try:
+            self.browser.close()
+        except Exception:
+            pass
+
+
+def _request_stop(signum, _frame):
+    log(f"[scheduler] received signal {signum}, stopping...")
+    _stop.set()
+
+
 def scheduler_loop():
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+    runner = SessionRunner(get_playwright())
+    try:
+        _scheduler_loop(runner)
+    finally:
+        runner.close()
+
+
+def _scheduler_loop(runner: SessionRunner):
     log("⏱ 初始化，读取下次清理/搬砖倒计时...")
-    clean_wait = fetch_countdown_wait("initial cleaning")
-    brick_wait = fetch_brick_wait("initial brick")
+    clean_wait = runner.call_with_backoff(fetch_countdown_wait, "initial cleaning")
+    brick_wait = runner.call_with_backoff(fetch_brick_wait, "initial brick")
+    if clean_wait is None or brick_wait is None:
+        return
     next_clean_at = time.time() + clean_wait
     next_brick_at = time.time() + brick_wait
 
-    while True:
+    while not _stop.is_set():
         now = time.time()
         if next_clean_at <= next_brick_at:
             task = "clean"
@@ -406,12 +822,22 @@ def scheduler_loop():
 
         if remaining <= 0:
             if task == "clean":
-                clean_wait, maybe_brick = run_cleaning_session()
+                # 砖场会在本次清理期间到点，则并入同一页面处理，省掉一次单独的搬砖会话
+                brick_due_at = (
+                    next_brick_at if next_brick_at - time.time() < CLEAN_SESSION_SEC else None
+                )
+                result = runner.call_with_backoff(run_cleaning_session, brick_due_at)
+                if result is None:
+                    break
+                clean_wait, maybe_brick = result
                 next_clean_at = time.time() + clean_wait
                 if maybe_brick is not None:
                     next_brick_at = time.time() + maybe_brick
             else:
-                brick_wait, maybe_clean = run_brick_session()
+                result = runner.call_with_backoff(run_brick_session)
+                if result is None:
+                    break
+                brick_wait, maybe_clean = result
                 next_brick_at = time.time() + brick_wait
                 if maybe_clean is not None:
                     next_clean_at = time.time() + maybe_clean
@@ -423,16 +849,23 @@ def scheduler_loop():
 
         if remaining > recheck_interval:
             log(f"[scheduler] next {task} in {int(remaining)}s; sleep {recheck_interval}s then recheck")
-            time.sleep(recheck_interval)
+            if _stop.wait(recheck_interval):
+                break
             if task == "clean":
-                clean_wait = fetch_countdown_wait("hourly recheck")
+                clean_wait = runner.call_with_backoff(fetch_countdown_wait, "hourly recheck")
+                if clean_wait is None:
+                    break
                 next_clean_at = time.time() + clean_wait
             else:
-                brick_wait = fetch_brick_wait("brick recheck")
+                brick_wait = runner.call_with_backoff(fetch_brick_wait, "brick recheck")
+                if brick_wait is None:
+                    break
                 next_brick_at = time.time() + brick_wait
         else:
             log(f"[scheduler] waiting {int(max(remaining, 1))}s for next {task}...")
-            time.sleep(max(remaining, 1))
+            if _stop.wait(max(remaining, 1)):
+                break
+    log("[scheduler] stopped")
 
 
 if __name__ == "__main__":
@@ -1,3 +1,4 @@
+import atexit
 import os
 import time
 from datetime import datetime
@@ -28,6 +29,13 @@ COOKIE_FILE_PATH = Path(
         ),
     )
 )
+# 浏览器持久化目录（HTTP 缓存 / localStorage / cookie）
+USER_DATA_DIR = Path(
+    os.getenv(
+        "PLANT_USER_DATA_DIR",
+        os.path.join(Path(__file__).resolve().parent, "data", "udd"),
+    )
+)
 
 # ====== 农场页面元素（按页面实际改）======
 SEL_FARM_ROOT      = "#lands-list"
@@ -51,22 +59,35 @@ FIXED_INTERVAL_SEC = 180
 SAFETY_BUFFER_SEC = -5
 MIN_WAKE_INTERVAL_SEC = 10
 FALLBACK_INTERVAL_SEC = 300
+HARVEST_CLICK_INTERVAL_MS = 200  # 收获时相邻两次点击的间隔，避免瞬间连发请求
 HEADLESS = os.getenv("PLANT_HEADLESS", os.getenv("HEADLESS", "true")).lower() != "false"
 OVERRIDE_CONFIRM = True         # 若页面使用原生 window.confirm，置 True 可直接短路为接受
+BLOCK_IMAGES = os.getenv("PLANT_BLOCK_IMAGES", "true").lower() != "false"  # 用启动参数禁图，不走路由，保留 HTTP 缓存
 
 # ====== 出售配置 ======
 SELL_AFTER_HARVEST = True        # 收获后自动出售背包全部作物
 
 
 # ====== 通用 ======
+# cookie 文件按 mtime 缓存；storage_state 按 cookie 值缓存
+_COOKIE_CACHE = {"mtime": None, "value": None}
+_STORAGE_STATE_CACHE = {"value": None, "state": None}
+
+
 def ensure_cookie_value() -> str:
     env_cookie = (os.getenv("PLANT_COOKIE") or os.getenv("SIQI_COOKIE") or "").strip()
     if env_cookie:
         return env_cookie
-    if COOKIE_FILE_PATH.exists():
-        value = COOKIE_FILE_PATH.read_text(encoding="utf-8").strip()
-        if value:
-            return value
+    try:
+        mtime = COOKIE_FILE_PATH.stat().st_mtime_ns
+    except OSError:
+        mtime = None
+    if mtime is not None:
+        if mtime != _COOKIE_CACHE["mtime"]:
+            _COOKIE_CACHE["value"] = COOKIE_FILE_PATH.read_text(encoding="utf-8").strip()
+            _COOKIE_CACHE["mtime"] = mtime
+        if _COOKIE_CACHE["value"]:
+            return _COOKIE_CACHE["value"]
     raise RuntimeError(
         f"未找到 cookie。请在管理页面填写 {COOKIE_NAME}，或设置 SIQI_COOKIE/PLANT_COOKIE 环境变量。"
     )
@@ -74,7 +95,9 @@ def ensure_cookie_value() -> str:
 
 def build_storage_state() -> dict:
     cookie_value = ensure_cookie_value()
-    return {
+    if _STORAGE_STATE_CACHE["value"] == cookie_value:
+        return _STORAGE_STATE_CACHE["state"]
+    state = {
         "cookies": [
             {
                 "name": COOKIE_NAME,
@@ -88,6 +111,9 @@ def build_storage_state() -> dict:
         ],
         "origins": [],
     }
+    _STORAGE_STATE_CACHE["value"] = cookie_value
+    _STORAGE_STATE_CACHE["state"] = state
+    return state
 
 
 # —— 新增小工具：判断指定地块是否已处于"已种植(.planted)"状态
@@ -110,25 +136,112 @@ def open_target(page):
     backoff = 1.0
     while True:
         try:
-            page.goto(URL, wait_until="domcontentloaded", timeout=45_000)
-            return
+            page.goto(URL, wait_until="domcontentloaded", timeout=15_000)
+            break
         except Exception as e:
             log(f"[open] load failed, retry in {backoff:.1f}s: {e}")
             time.sleep(backoff)
             backoff = min(backoff * 1.8, 10)
+    # 等地块本身出现，而不只是 #lands-list 容器
+    try:
+        page.wait_for_selector(SEL_PLOTS_ALL, state="attached", timeout=10_000)
+    except PlaywrightTimeoutError:
+        log("⚠️ 农场根元素未出现，继续尝试…")
+
+# 注入页面：统计进行中的 fetch/XHR（window.__inflight），供 wait_ready 判断请求是否都已结束
+INFLIGHT_TRACKER_JS = """
+(() => {
+    window.__inflight = 0;
+    const done = () => { window.__inflight = Math.max(0, window.__inflight - 1); };
+    if (window.fetch) {
+        const origFetch = window.fetch;
+        window.fetch = function (...args) {
+            window.__inflight++;
+            return origFetch.apply(this, args).finally(done);
+        };
+    }
+    const origSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function (...args) {
+        window.__inflight++;
+        this.addEventListener('loadend', done, { once: true });
+        return origSend.apply(this, args);
+    };
+})();
+"""
+
+def wait_ready(page, timeout_ms: int = 3000):
+    """
+    代替 networkidle：等 document 加载完成，再等没有进行中的 fetch/XHR，
+    且资源请求数连续 200ms 不再增长。超时只记日志，不抛异常。
+    """
+    try:
+        # 同时清掉上一次留下的计数快照
+        page.wait_for_function(
+            "() => { window.__resCount = undefined; return document.readyState === 'complete'; }",
+            timeout=timeout_ms,
+        )
+        page.wait_for_function(
+            """() => {
+                const n = performance.getEntriesByType('resource').length;
+                const now = performance.now();
+                if ((window.__inflight || 0) > 0 || window.__resCount !== n) {
+                    window.__resCount = n;
+                    window.__resStableAt = now;
+                    return false;
+                }
+                return now - window.__resStableAt >= 200;
+            }""",
+            timeout=timeout_ms,
+            polling=100,
+        )
+    except PlaywrightTimeoutError:
+        log(f"[wait] 页面 {timeout_ms}ms 内未稳定，继续执行")
+    except Exception as e:
+        log(f"[wait] wait_ready err: {e}")
 
 # ====== 工具 ======
-def plot_key_selector(el) -> str:
-    land = el.get_attribute("data-land") or ""
-    idx  = el.get_attribute("data-plot") or ""
-    return f'.p-plot[data-land="{land}"][data-plot="{idx}"]'
+# 在页面内批量派发 click，省掉每次点击一次 CDP 往返；ms > 0 时每次成功点击后停顿 ms
+# 与 autoMowan.py 中的同名实现保持同一签名
+DISPATCH_CLICKS_JS = """async ([sels, ms]) => {
+    const out = [];
+    for (const s of sels) {
+        const el = document.querySelector(s);
+        if (!el) { out.push(false); continue; }
+        el.dispatchEvent(new MouseEvent('click', { bubbles: true }));
+        out.push(true);
+        if (ms > 0) await new Promise(r => setTimeout(r, ms));
+    }
+    return out;
+}"""
+
+def dispatch_clicks(page, selectors: list[str], interval_ms: int = 0) -> list[bool]:
+    """一次 evaluate 内对所有选择器派发 click 事件，返回每个元素是否点到"""
+    if not selectors:
+        return []
+    return page.evaluate(DISPATCH_CLICKS_JS, [selectors, interval_ms])
+
+# 在页面内由元素生成地块唯一选择器，供各处 eval_on_selector_all 复用
+PLOT_KEY_JS = """e => '.p-plot[data-land="' + (e.getAttribute('data-land') || '')
+    + '"][data-plot="' + (e.getAttribute('data-plot') || '') + '"]'"""
 
-def is_mature(el) -> bool:
+def read_plot_keys(page, selector: str) -> list[str]:
+    """一次往返取回匹配 selector 的全部地块选择器"""
+    return page.eval_on_selector_all(selector, f"els => els.map({PLOT_KEY_JS})")
+
+def read_mature_selectors(page, now: int) -> list[str]:
+    """成熟判断放在页面内完成，一次往返直接拿到成熟地块选择器"""
     try:
-        t = el.get_attribute("data-harvest-time")
-        return bool(t) and int(t) <= int(time.time())
-    except Exception:
-        return False
+        return page.eval_on_selector_all(
+            SEL_PLOTS_PLANTED,
+            f"""(els, now) => els.filter(e => {{
+                const t = Number(e.getAttribute('data-harvest-time') || 0);
+                return t > 0 && t <= now;
+            }}).map({PLOT_KEY_JS})""",
+            now,
+        )
+    except Exception as e:
+        log(f"[harvest] 读取成熟地块失败: {e}")
+        return []
 
 def get_next_harvest_ts(page) -> int:
     now = int(time.time())
@@ -145,29 +258,34 @@ def get_next_harvest_ts(page) -> int:
 
 # ====== 收获：逐块点击成熟地块 ======
 def harvest_mature_plots(page):
-    planted = page.locator(SEL_PLOTS_PLANTED)
-    n = planted.count()
-    mature_selectors = []
-    for i in range(n):
-        el = planted.nth(i)
-        if is_mature(el):
-            mature_selectors.append(plot_key_selector(el))
+    mature_selectors = read_mature_selectors(page, int(time.time()))
 
     if not mature_selectors:
         log("[harvest] 没有成熟地块。")
         return 0
 
     log(f"[harvest] 成熟地块数量: {len(mature_selectors)}")
-    for idx, sel in enumerate(mature_selectors, 1):
-        try:
-            page.locator(sel).click(timeout=4000)
+    try:
+        results = dispatch_clicks(page, mature_selectors, HARVEST_CLICK_INTERVAL_MS)
+    except Exception as e:
+        log(f"[harvest] 批量点击异常: {e}")
+        results = []
+    for idx, ok in enumerate(results, 1):
+        if ok:
             log(f"[harvest] {idx}/{len(mature_selectors)} -> confirm accept")
-        except Exception as e:
-            log(f"[harvest] {idx} 异常: {e}")
-        page.wait_for_timeout(200)
-    # 等网络与 DOM 稳定
-    page.wait_for_load_state("networkidle")
-    page.wait_for_timeout(400)
+        else:
+            log(f"[harvest] {idx} 地块已不存在，跳过")
+    # 等被点过的地块全部去掉 .planted，再等网络稳定
+    clicked = [sel for sel, ok in zip(mature_selectors, results) if ok]
+    try:
+        page.wait_for_function(
+            "sels => sels.every(s => !document.querySelector(s)?.classList.contains('planted'))",
+            arg=clicked,
+            timeout=4000,
+        )
+    except PlaywrightTimeoutError:
+        log("[harvest] 部分地块 4s 内仍为 planted，继续")
+    wait_ready(page)
     return len(mature_selectors)
 
 # ====== 出售背包作物 ======
@@ -213,16 +331,19 @@ def sell_one_crop(page, seed_id: int, quantity: int = None):
                 inp.dispatchEvent(new Event('change', {{ bubbles: true }}));
             }}"""
         )
-        page.wait_for_timeout(150)
 
         # 滚动到按钮位置再点"售出"
         btn_el.scroll_into_view_if_needed()
-        page.wait_for_timeout(100)
         btn_el.click(timeout=3000)
         log(f"[sell] 点击售出：seed_id={seed_id}, 数量={quantity}")
 
-        # 弹窗确认：点"确认售出"按钮
-        page.wait_for_timeout(300)
+        # 弹窗确认：等弹窗出现即点"确认售出"按钮
+        try:
+            page.wait_for_selector(
+                "#sell-ok-btn, button:has-text('确认售出')", state="visible", timeout=1500
+            )
+        except PlaywrightTimeoutError:
+            pass
         try:
             ok_btn = page.locator("#sell-ok-btn")
             if ok_btn.count() > 0 and ok_btn.first.is_visible():
@@ -238,7 +359,7 @@ def sell_one_crop(page, seed_id: int, quantity: int = None):
             log(f"[sell] 确认弹窗点击异常(可能无弹窗): {e}")
 
         # 等网络稳定
-        page.wait_for_timeout(500)
+        wait_ready(page)
 
         return quantity
     except Exception as e:
@@ -285,7 +406,6 @@ def sell_all_inventory(page):
                 total_kinds += 1
                 total_qty   += qty
                 log(f"[sell] 已出售 {name or f'seed_id={seed_id}'} x{qty}")
-            page.wait_for_timeout(200)
         except Exception as e:
             log(f"[sell] 第 {i} 个物品出售异常: {e}")
 
@@ -324,20 +444,13 @@ def confirm_plant_if_needed(page):
 
 def plant_on_all_empty_slots(page):
     # 1) 空地 = 不是已种(.planted)，也不是购买位/未解锁位
-    empty = page.locator(
-        f'{SEL_PLOTS_ALL}:not(.planted):not(.slot-buyable):not(.slot-locked)'
+    empty_keys = read_plot_keys(
+        page, f'{SEL_PLOTS_ALL}:not(.planted):not(.slot-buyable):not(.slot-locked)'
     )
-
-    cnt = empty.count()
-    if cnt <= 0:
+    if not empty_keys:
         log("[plant] 无空地，无需补种。")
         return 0
 
-    empty_keys = []
-    for i in range(cnt):
-        el = empty.nth(i)
-        empty_keys.append(plot_key_selector(el))
-
     # 2) 选择种子
     seed_loc, which = pick_seed_locator(page)
     if seed_loc is None:
@@ -374,11 +487,20 @@ def plant_on_all_empty_slots(page):
         def click_plot_once():
             try:
                 page.locator(sel).click(timeout=2000)
-                page.wait_for_timeout(150)
-                return True
             except Exception as e:
                 log(f"[plant] 点击空地失败（{sel}）：{e}")
                 return False
+            # 等该地块出现 .planted 即返回，不再固定 sleep
+            try:
+                page.wait_for_function(
+                    "sel => document.querySelector(sel)?.classList.contains('planted')",
+                    arg=sel,
+                    timeout=2000,
+                )
+                return True
+            except PlaywrightTimeoutError:
+                log(f"[plant] {sel} 2s 内未变为 planted")
+                return False
 
         ok = click_plot_once()
         if ok:
@@ -387,36 +509,84 @@ def plant_on_all_empty_slots(page):
         else:
             log(f"[plant] {idx}/{len(empty_keys)} ❌ 未能种上")
 
-        page.wait_for_timeout(150)
-
-    page.wait_for_load_state("networkidle")
-    page.wait_for_timeout(300)
+    wait_ready(page)
     return planted_ok
 
-# ====== 单次执行：收获 → 出售 → 补种 → 计算下次时间 ======
-def run_once():
-    with sync_playwright() as p:
-        browser = p.chromium.launch(
-            headless=HEADLESS,
-            args=["--disable-blink-features=AutomationControlled"],
-        )
+_PW = None
 
-        storage_state = build_storage_state()
-        log("🔐 使用当前 cookie 登录…")
-        context = browser.new_context(
-            storage_state=storage_state,
-            viewport={"width": 1280, "height": 800},
-        )
+def get_playwright():
+    """Playwright 驱动进程全局只启动一次，进程退出时统一关闭"""
+    global _PW
+    if _PW is None:
+        _PW = sync_playwright().start()
+    return _PW
 
-        if OVERRIDE_CONFIRM:
-            context.add_init_script("() => { window.confirm = () => true; }")
 
-        page = context.new_page()
-        open_target(page)
+def restart_playwright():
+    """驱动进程已退出（如 Node 崩溃、终端 SIGINT 波及进程组）时丢弃旧实例，重新启动"""
+    global _PW
+    if _PW is not None:
         try:
-            page.wait_for_selector(SEL_FARM_ROOT, timeout=20_000)
-        except PlaywrightTimeoutError:
-            log("⚠️ 农场根元素未出现，继续尝试…")
+            _PW.stop()
+        except Exception:
+            pass
+        _PW = None
+    log("[watchdog] restarting playwright driver...")
+    return get_playwright()
+
+
+def _stop_playwright():
+    if _PW is not None:
+        try:
+            _PW.stop()
+        except Exception:
+            pass
+
+
+atexit.register(_stop_playwright)
+
+def open_farm_context(playwright_obj):
+    """
+    用持久化 user-data-dir 启动，跨次运行复用磁盘缓存与站点存储。
+    cookie 每次都按当前配置写入，保证更新 cookie 后立即生效。
+    不装 context.route：一旦启用路由，Chromium 会绕过 HTTP 缓存。
+    """
+    USER_DATA_DIR.mkdir(parents=True, exist_ok=True)
+    args = ["--disable-blink-features=AutomationControlled"]
+    if BLOCK_IMAGES:
+        args.append("--blink-settings=imagesEnabled=false")
+    context = playwright_obj.chromium.launch_persistent_context(
+        user_data_dir=str(USER_DATA_DIR),
+        headless=HEADLESS,
+        args=args,
+        viewport={"width": 1280, "height": 800},
+    )
+    context.add_cookies(build_storage_state()["cookies"])
+    context.add_init_script(INFLIGHT_TRACKER_JS)
+    if OVERRIDE_CONFIRM:
+        context.add_init_script("window.confirm = () => true;")
+    return context
+
+
+def launch_farm_context():
+    try:
+        return open_farm_context(get_playwright())
+    except Exception as e:
+        log(f"[watchdog] 浏览器启动失败，驱动可能已退出: {e}")
+        return open_farm_context(restart_playwright())
+
+
+def get_page(context):
+    return context.pages[0] if context.pages else context.new_page()
+
+
+# ====== 单次执行：收获 → 出售 → 补种 → 计算下次时间 ======
+def run_once():
+    log("🔐 使用当前 cookie 登录…")
+    context = launch_farm_context()
+    try:
+        page = get_page(context)
+        open_target(page)
 
         harvested = harvest_mature_plots(page)
 
@@ -432,7 +602,9 @@ def run_once():
         planted = plant_on_all_empty_slots(page)
 
         next_ts = get_next_harvest_ts(page)
-        browser.close()
+    finally:
+        # 驱动不再随每次运行退出，异常时也要关掉浏览器，释放 user-data-dir 锁
+        context.close()
 
     # 调度
     now_ms = int(time.time() * 1000)
@@ -473,24 +645,15 @@ def loop_fixed():
 # ====== 测试入口：单独出售指定 seed_id（跑一次就退出）======
 def run_sell_test(seed_id: int = 4, quantity: int = None):
     """单独测试出售功能：只打开页面出售指定作物，不收获不补种"""
-    with sync_playwright() as p:
-        browser = p.chromium.launch(
-            headless=HEADLESS,
-            args=["--disable-blink-features=AutomationControlled"],
-        )
-        storage_state = build_storage_state()
-        context = browser.new_context(
-            storage_state=storage_state,
-            viewport={"width": 1280, "height": 800},
-        )
-        if OVERRIDE_CONFIRM:
-            context.add_init_script("() => { window.confirm = () => true; }")
-        page = context.new_page()
+    context = launch_farm_context()
+    try:
+        page = get_page(context)
         open_target(page)
 
         qty = sell_one_crop(page, seed_id, quantity)
         log(f"[test] 出售 seed_id={seed_id}, 数量={qty if qty else '失败'}")
-        browser.close()
+    finally:
+        context.close()
 
 
 if __name__ == "__main__":